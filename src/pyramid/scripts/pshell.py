@@ -1,15 +1,15 @@
-import argparse
-from code import interact
+from collections.abc import Mapping
 from contextlib import contextmanager
 import os
-import pkg_resources
 import sys
-import textwrap
 
-from pyramid.paster import bootstrap
-from pyramid.scripts.common import get_config_loader, parse_vars
-from pyramid.settings import aslist
-from pyramid.util import DottedNameResolver, make_contextmanager
+from pyramid.decorator import reify
+
+_newline_to_space = str.maketrans('\n', ' ')
+_banner_prefix = (
+    f'Python {sys.version} on {sys.platform}\n'
+    'Type "help" for more information.'
+)
 
 
 def main(argv=sys.argv, quiet=False):
@@ -17,104 +17,236 @@ def main(argv=sys.argv, quiet=False):
     return command.run()
 
 
-def python_shell_runner(env, help, interact=interact):
-    cprt = 'Type "help" for more information.'
-    banner = f"Python {sys.version} on {sys.platform}\n{cprt}"
-    banner += '\n\n' + help + '\n'
+def python_shell_runner(env, help, interact=None):
+    if interact is None:  # pragma: no cover
+        from code import interact
+
+    banner = f'{_banner_prefix}\n\n{help}\n'
     interact(banner, local=env)
 
 
+def iter_entry_points(group):
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:  # pragma: no cover (python < 3.8)
+        import pkg_resources
+
+        return pkg_resources.iter_entry_points(group)
+
+    if sys.version_info >= (3, 10):  # pragma: no cover
+        return entry_points(group=group)
+    return entry_points().get(group, [])  # pragma: no cover
+
+
+def get_startup_cache_dir():
+    cache_home = os.environ.get('XDG_CACHE_HOME')
+    if not cache_home:
+        cache_home = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'pyramid', 'pshell')
+
+
+def get_startup_code(path, cache_dir=None):
+    """Return a code object for the ``PYTHONSTARTUP`` file at ``path``.
+
+    The compiled bytecode is cached in ``cache_dir`` (by default
+    ``~/.cache/pyramid/pshell``, subject to :data:`sys.dont_write_bytecode`)
+    and reused until the file's mtime or size changes.
+    """
+    import hashlib
+    from importlib.util import MAGIC_NUMBER
+    import marshal
+
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    if cache_dir is None:
+        cache_dir = get_startup_cache_dir()
+    key = hashlib.sha1(path.encode('utf-8', 'surrogateescape')).hexdigest()
+    cache_path = os.path.join(cache_dir, f'startup-{key}.pyc')
+
+    try:
+        with open(cache_path, 'rb') as fp:
+            data = fp.read()
+        if data[: len(MAGIC_NUMBER)] == MAGIC_NUMBER:
+            mtime, size, code = marshal.loads(data[len(MAGIC_NUMBER) :])
+            if (mtime, size) == (st.st_mtime_ns, st.st_size):
+                return code
+    except (OSError, ValueError, EOFError, TypeError):
+        pass
+
+    with open(path, 'rb') as fp:
+        code = compile(fp.read(), path, 'exec')
+
+    if not sys.dont_write_bytecode:
+        data = MAGIC_NUMBER + marshal.dumps((st.st_mtime_ns, st.st_size, code))
+        tmp_path = f'{cache_path}.{os.getpid()}'
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(tmp_path, 'wb') as fp:
+                fp.write(data)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    return code
+
+
+class LazyObjects(Mapping):
+    """A mapping of the ``[pshell]`` section which resolves dotted names
+    the first time they are looked up, so that modules referenced by the
+    section are only imported once the shell environment is built."""
+
+    def __init__(self, resolver):
+        self.resolver = resolver
+        self._values = {}
+        # several names may alias the same dotted name; resolve each once
+        self._resolved = {}
+
+    def __setitem__(self, name, value):
+        self._values[name] = value
+
+    def __getitem__(self, name):
+        value = self._values[name]
+        if not isinstance(value, str):
+            return value
+        try:
+            return self._resolved[value]
+        except KeyError:
+            obj = self._resolved[value] = self.resolver.maybe_resolve(value)
+            return obj
+
+    def __contains__(self, name):
+        # avoid Mapping.__contains__, which would resolve the value
+        return name in self._values
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+
 class PShellCommand:
     description = """\
-    Open an interactive shell with a Pyramid app loaded.  This command
-    accepts one positional argument named "config_uri" which specifies the
-    PasteDeploy config file to use for the interactive shell. The format is
-    "inifile#name". If the name is left off, the Pyramid default application
-    will be assumed.  Example: "pshell myapp.ini#main".
-
-    If you do not point the loader directly at the section of the ini file
-    containing your Pyramid application, the command will attempt to
-    find the app for you. If you are loading a pipeline that contains more
-    than one Pyramid application within it, the loader will use the
-    last one.
-    """
-    bootstrap = staticmethod(bootstrap)  # for testing
-    get_config_loader = staticmethod(get_config_loader)  # for testing
-    pkg_resources = pkg_resources  # for testing
-
-    parser = argparse.ArgumentParser(
-        description=textwrap.dedent(description),
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-    )
-    parser.add_argument(
-        '-p',
-        '--python-shell',
-        action='store',
-        dest='python_shell',
-        default='',
-        help=(
-            'Select the shell to use. A list of possible '
-            'shells is available using the --list-shells '
-            'option.'
-        ),
-    )
-    parser.add_argument(
-        '-l',
-        '--list-shells',
-        dest='list',
-        action='store_true',
-        help='List all available shells.',
-    )
-    parser.add_argument(
-        '--setup',
-        dest='setup',
-        help=(
-            "A callable that will be passed the environment "
-            "before it is made available to the shell. This "
-            "option will override the 'setup' key in the "
-            "[pshell] ini section."
-        ),
-    )
-    parser.add_argument(
-        'config_uri',
-        nargs='?',
-        default=None,
-        help='The URI to the configuration file.',
-    )
-    parser.add_argument(
-        'config_vars',
-        nargs='*',
-        default=(),
-        help="Variables required by the config file. For example, "
-        "`http_port=%%(http_port)s` would expect `http_port=8080` to be "
-        "passed here.",
-    )
-
-    default_runner = python_shell_runner  # testing
+Open an interactive shell with a Pyramid app loaded.  This command
+accepts one positional argument named "config_uri" which specifies the
+PasteDeploy config file to use for the interactive shell. The format is
+"inifile#name". If the name is left off, the Pyramid default application
+will be assumed.  Example: "pshell myapp.ini#main".
+
+If you do not point the loader directly at the section of the ini file
+containing your Pyramid application, the command will attempt to
+find the app for you. If you are loading a pipeline that contains more
+than one Pyramid application within it, the loader will use the
+last one.
+"""
+    iter_entry_points = staticmethod(iter_entry_points)  # for testing
+
+    default_runner = staticmethod(python_shell_runner)  # testing
 
     loaded_objects = {}
     object_help = {}
     preferred_shells = []
     setup = None
     pystartup = os.environ.get('PYTHONSTARTUP')
-    resolver = DottedNameResolver(None)
+    pystartup_cache_dir = None  # defaults to get_startup_cache_dir()
+    _parser = None
 
     def __init__(self, argv, quiet=False):
         self.quiet = quiet
-        self.args = self.parser.parse_args(argv[1:])
+        self.args = self._get_parser().parse_args(argv[1:])
+
+    @classmethod
+    def _get_parser(cls):
+        parser = cls._parser
+        if parser is not None:
+            return parser
+
+        import argparse
+
+        parser = argparse.ArgumentParser(
+            description=cls.description,
+            formatter_class=argparse.RawDescriptionHelpFormatter,
+        )
+        parser.add_argument(
+            '-p',
+            '--python-shell',
+            action='store',
+            dest='python_shell',
+            default='',
+            help=(
+                'Select the shell to use. A list of possible '
+                'shells is available using the --list-shells '
+                'option.'
+            ),
+        )
+        parser.add_argument(
+            '-l',
+            '--list-shells',
+            dest='list',
+            action='store_true',
+            help='List all available shells.',
+        )
+        parser.add_argument(
+            '--setup',
+            dest='setup',
+            help=(
+                "A callable that will be passed the environment "
+                "before it is made available to the shell. This "
+                "option will override the 'setup' key in the "
+                "[pshell] ini section."
+            ),
+        )
+        parser.add_argument(
+            'config_uri',
+            nargs='?',
+            default=None,
+            help='The URI to the configuration file.',
+        )
+        parser.add_argument(
+            'config_vars',
+            nargs='*',
+            default=(),
+            help="Variables required by the config file. For example, "
+            "`http_port=%%(http_port)s` would expect `http_port=8080` to be "
+            "passed here.",
+        )
+        cls._parser = parser
+        return parser
+
+    @reify
+    def resolver(self):
+        from pyramid.util import DottedNameResolver
+
+        return DottedNameResolver(None)
+
+    # the app-loading machinery is imported on first use so that
+    # ``pshell --list-shells`` and ``--help`` do not pay for it
+
+    def bootstrap(self, config_uri, request=None, options=None):
+        from pyramid.paster import bootstrap
+
+        return bootstrap(config_uri, request=request, options=options)
+
+    def get_config_loader(self, config_uri):
+        from pyramid.scripts.common import get_config_loader
+
+        return get_config_loader(config_uri)
 
     def pshell_file_config(self, loader, defaults):
         settings = loader.get_settings('pshell', defaults)
-        self.loaded_objects = {}
+        self.loaded_objects = LazyObjects(self.resolver)
         self.object_help = {}
         self.setup = None
         for k, v in settings.items():
             if k == 'setup':
                 self.setup = v
             elif k == 'default_shell':
-                self.preferred_shells = [x.lower() for x in aslist(v)]
+                # same as aslist(v): names separated by any whitespace
+                self.preferred_shells = [x.lower() for x in v.split()]
             else:
-                self.loaded_objects[k] = self.resolver.maybe_resolve(v)
+                self.loaded_objects[k] = v
                 self.object_help[k] = v
 
     def out(self, msg):  # pragma: no cover
@@ -128,6 +260,8 @@ class PShellCommand:
             self.out('Requires a config file argument')
             return 2
 
+        from pyramid.scripts.common import parse_vars
+
         config_uri = self.args.config_uri
         config_vars = parse_vars(self.args.config_vars)
         loader = self.get_config_loader(config_uri)
@@ -155,24 +289,24 @@ class PShellCommand:
 
     @contextmanager
     def setup_env(self):
-        # setup help text for default environment
+        # setup help text for default environment, leaving out anything
+        # from the pshell section so that custom vars override it
         env = self.env
-        env_help = dict(env)
-        env_help['app'] = 'The WSGI application.'
-        env_help['root'] = 'Root of the default resource tree.'
-        env_help['registry'] = 'Active Pyramid registry.'
-        env_help['request'] = 'Active request object.'
-        env_help[
-            'root_factory'
-        ] = 'Default root factory used to create `root`.'
+        loaded_objects = self.loaded_objects
+        env_help = {k: v for k, v in env.items() if k not in loaded_objects}
+        default_help = {
+            'app': 'The WSGI application.',
+            'root': 'Root of the default resource tree.',
+            'registry': 'Active Pyramid registry.',
+            'request': 'Active request object.',
+            'root_factory': 'Default root factory used to create `root`.',
+        }
+        for k, v in default_help.items():
+            if k not in loaded_objects:
+                env_help[k] = v
 
         # load the pshell section of the ini file
-        env.update(self.loaded_objects)
-
-        # eliminate duplicates from env, allowing custom vars to override
-        for k in self.loaded_objects:
-            if k in env_help:
-                del env_help[k]
+        env.update(loaded_objects)
 
         # override use_script with command-line options
         if self.args.setup:
@@ -182,40 +316,71 @@ class PShellCommand:
             # call the setup callable
             self.setup = self.resolver.maybe_resolve(self.setup)
 
+        if not self.setup:
+            # nothing can change the env, so skip the snapshot and the
+            # no-op context manager altogether
+            self._finish_env(env, env_help)
+            yield
+            return
+
+        from pyramid.util import make_contextmanager
+
         # store the env before muddling it with the script
         orig_env = env.copy()
-        setup_manager = make_contextmanager(self.setup)
-        with setup_manager(env):
+        with make_contextmanager(self.setup)(env):
             # remove any objects from default help that were overidden
-            for k, v in env.items():
-                if k not in orig_env or v is not orig_env[k]:
-                    if getattr(v, '__doc__', False):
-                        env_help[k] = v.__doc__.replace("\n", " ")
-                    else:
-                        env_help[k] = v
+            changed = [
+                (k, v)
+                for k, v in env.items()
+                if k not in orig_env or v is not orig_env[k]
+            ]
             del orig_env
+            for k, v in changed:
+                doc = getattr(v, '__doc__', None)
+                env_help[k] = doc.translate(_newline_to_space) if doc else v
 
-            # generate help text
-            help = ''
-            if env_help:
-                help += 'Environment:'
-                for var in sorted(env_help.keys()):
-                    help += '\n  %-12s %s' % (var, env_help[var])
-
-            if self.object_help:
-                help += '\n\nCustom Variables:'
-                for var in sorted(self.object_help.keys()):
-                    help += '\n  %-12s %s' % (var, self.object_help[var])
-
-            if self.pystartup and os.path.isfile(self.pystartup):
-                with open(self.pystartup, 'rb') as fp:
-                    exec(fp.read().decode('utf-8'), env)
-                if '__builtins__' in env:
-                    del env['__builtins__']
-
-            self.help = help.strip()
+            self._finish_env(env, env_help)
             yield
 
+    def _finish_env(self, env, env_help):
+        # generate help text
+        lines = []
+        if env_help:
+            lines.append('Environment:')
+            lines.extend(
+                f'  {var:<12} {doc}' for var, doc in sorted(env_help.items())
+            )
+
+        if self.object_help:
+            if lines:
+                lines.append('')
+            lines.append('Custom Variables:')
+            lines.extend(
+                f'  {var:<12} {doc}'
+                for var, doc in sorted(self.object_help.items())
+            )
+
+        if self.pystartup:
+            # reading the file doubles as the existence check, saving
+            # a separate stat() call on every launch
+            try:
+                code = get_startup_code(
+                    self.pystartup, self.pystartup_cache_dir
+                )
+            except (
+                FileNotFoundError,
+                IsADirectoryError,
+                NotADirectoryError,
+            ):
+                # same as the old os.path.isfile() check; other errors,
+                # such as an unreadable file, still propagate
+                pass
+            else:
+                exec(code, env)
+                env.pop('__builtins__', None)
+
+        self.help = '\n'.join(lines)
+
     def show_shells(self):
         shells = self.find_all_shells()
         sorted_names = sorted(shells.keys(), key=lambda x: x.lower())
@@ -226,46 +391,47 @@ class PShellCommand:
         return 0
 
     def find_all_shells(self):
-        pkg_resources = self.pkg_resources
+        # entry points are returned unloaded; loading a runner imports its
+        # shell, so it is deferred until one has been chosen
+        eps = self.iter_entry_points('pyramid.pshell_runner')
+        return {ep.name: ep for ep in eps}
 
-        shells = {}
-        for ep in pkg_resources.iter_entry_points('pyramid.pshell_runner'):
-            name = ep.name
-            shell_factory = ep.load()
-            shells[name] = shell_factory
-        return shells
+    def find_shell(self, name):
+        for ep in self.iter_entry_points('pyramid.pshell_runner'):
+            if ep.name == name:
+                return ep.load()
 
     def make_shell(self):
-        shells = self.find_all_shells()
+        user_shell = self.args.python_shell.lower()
+        if user_shell == 'python':
+            # the builtin runner needs no entry point discovery
+            return self.default_runner
 
         shell = None
-        user_shell = self.args.python_shell.lower()
 
         if not user_shell:
+            shells = self.find_all_shells()
             preferred_shells = self.preferred_shells
             if not preferred_shells:
                 # by default prioritize all shells above python
                 preferred_shells = [k for k in shells.keys() if k != 'python']
             max_weight = len(preferred_shells)
 
-            def order(x):
-                # invert weight to reverse sort the list
-                # (closer to the front is higher priority)
-                try:
-                    return preferred_shells.index(x[0].lower()) - max_weight
-                except ValueError:
-                    return 1
+            # invert weight so the lowest one wins
+            # (closer to the front is higher priority)
+            weights = {}
+            for idx, name in enumerate(preferred_shells):
+                weights.setdefault(name, idx - max_weight)
 
-            sorted_shells = sorted(shells.items(), key=order)
+            def order(x):
+                return weights.get(x[0].lower(), 1)
 
-            if len(sorted_shells) > 0:
-                shell = sorted_shells[0][1]
+            if shells:
+                shell = min(shells.items(), key=order)[1].load()
 
         else:
-            runner = shells.get(user_shell)
-
-            if runner is not None:
-                shell = runner
+            # only import the shell that was asked for
+            shell = self.find_shell(user_shell)
 
             if shell is None:
                 raise ValueError(
@@ -163,14 +163,23 @@ class DummyEntryPoint:
         return self.module
 
 
-class DummyPkgResources:
+class DummyBrokenEntryPoint:
+    def __init__(self, name):
+        self.name = name
+
+    def load(self):  # pragma: no cover
+        raise AssertionError(f'{self.name} should not be loaded')
+
+
+class DummyEntryPoints:
     def __init__(self, entry_point_values):
         self.entry_points = []
 
         for name, module in entry_point_values.items():
             self.entry_points.append(DummyEntryPoint(name, module))
 
-    def iter_entry_points(self, name):
+    def __call__(self, group):
+        self.group = group
         return self.entry_points
 
 
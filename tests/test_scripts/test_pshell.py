@@ -49,8 +49,16 @@ class TestPShellCommand(unittest.TestCase):
         cmd.pystartup = None
         return cmd
 
+    def _makeTempDir(self):
+        import shutil
+        import tempfile
+
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        return tmpdir
+
     def _makeEntryPoints(self, command, shells):
-        command.pkg_resources = dummy.DummyPkgResources(shells)
+        command.iter_entry_points = dummy.DummyEntryPoints(shells)
 
     def test_command_loads_default_shell(self):
         command = self._makeOne()
@@ -163,6 +171,64 @@ class TestPShellCommand(unittest.TestCase):
         shell = command.make_shell()
         self.assertEqual(shell, dshell)
 
+    def test_shell_override_python_skips_entry_points(self):
+        command = self._makeOne()
+        dshell = dummy.DummyShell()
+
+        def iter_entry_points(group):  # pragma: no cover
+            raise AssertionError('entry points should not be scanned')
+
+        command.iter_entry_points = iter_entry_points
+        command.default_runner = dshell
+        command.args.python_shell = 'Python'
+        shell = command.make_shell()
+        self.assertEqual(shell, dshell)
+
+    def test_shell_override_loads_only_selected_shell(self):
+        command = self._makeOne()
+        ipshell = dummy.DummyShell()
+
+        broken = dummy.DummyBrokenEntryPoint('bpython')
+        entry_points = dummy.DummyEntryPoints({'ipython': ipshell})
+        entry_points.entry_points.insert(0, broken)
+        command.iter_entry_points = entry_points
+        command.args.python_shell = 'ipython'
+        shell = command.make_shell()
+        self.assertEqual(shell, ipshell)
+
+    def test_shell_ordering_loads_only_selected_shell(self):
+        command = self._makeOne()
+        ipshell = dummy.DummyShell()
+
+        broken = dummy.DummyBrokenEntryPoint('bpython')
+        entry_points = dummy.DummyEntryPoints({'ipython': ipshell})
+        entry_points.entry_points.append(broken)
+        command.iter_entry_points = entry_points
+        command.preferred_shells = ['ipython', 'bpython']
+        shell = command.make_shell()
+        self.assertEqual(shell, ipshell)
+
+    def test_shell_override_python_uses_python_shell_runner(self):
+        from pyramid.scripts.pshell import python_shell_runner
+
+        command = self._makeOne()
+        command.args.python_shell = 'python'
+        shell = command.make_shell()
+        self.assertIs(shell, python_shell_runner)
+
+        interact = dummy.DummyInteractor()
+        shell({'foo': 'bar'}, 'a help message', interact=interact)
+        self.assertEqual(interact.local, {'foo': 'bar'})
+        self.assertIn('a help message', interact.banner)
+
+    def test_shell_falls_back_to_python_shell_runner(self):
+        from pyramid.scripts.pshell import python_shell_runner
+
+        command = self._makeOne()
+        self._makeEntryPoints(command, {})
+        shell = command.make_shell()
+        self.assertIs(shell, python_shell_runner)
+
     def test_shell_ordering(self):
         command = self._makeOne()
         ipshell = dummy.DummyShell()
@@ -210,6 +276,69 @@ class TestPShellCommand(unittest.TestCase):
         self.assertTrue(self.bootstrap.closer.called)
         self.assertTrue(shell.help)
 
+    def test_command_resolves_dotted_names_once(self):
+        command = self._makeOne()
+        calls = []
+
+        class Resolver:
+            def maybe_resolve(self, v):
+                calls.append(v)
+                return 'resolved ' + v
+
+        command.resolver = Resolver()
+        self.loader.settings = {
+            'pshell': {'a': 'pkg.mod', 'b': 'pkg.mod', 'c': 'pkg.other'}
+        }
+        shell = dummy.DummyShell()
+        command.run(shell)
+        self.assertEqual(calls, ['pkg.mod', 'pkg.other'])
+        self.assertEqual(shell.env['a'], 'resolved pkg.mod')
+        self.assertEqual(shell.env['b'], 'resolved pkg.mod')
+        self.assertEqual(shell.env['c'], 'resolved pkg.other')
+
+    def test_command_defers_resolving_until_shell_is_found(self):
+        command = self._makeOne()
+        command.out = lambda msg: None
+        calls = []
+
+        class Resolver:
+            def maybe_resolve(self, v):  # pragma: no cover
+                calls.append(v)
+
+        command.resolver = Resolver()
+        self._makeEntryPoints(command, {})
+        self.loader.settings = {'pshell': {'a': 'pkg.mod'}}
+        command.args.python_shell = 'unknown_python_shell'
+        result = command.run()
+        self.assertEqual(result, 1)
+        self.assertEqual(calls, [])
+
+    def test_command_help_text(self):
+        command = self._makeOne()
+
+        class Resolver:
+            def maybe_resolve(self, v):
+                return dummy.Dummy()
+
+        command.resolver = Resolver()
+        self.loader.settings = {'pshell': {'m': 'pkg.m', 'User': 'pkg.User'}}
+        shell = dummy.DummyShell()
+        command.run(shell)
+        self.assertEqual(
+            shell.help,
+            'Environment:\n'
+            '  app          The WSGI application.\n'
+            '  registry     Active Pyramid registry.\n'
+            '  request      Active request object.\n'
+            '  root         Root of the default resource tree.\n'
+            '  root_factory Default root factory used to create `root`.\n'
+            '\n'
+            'Custom Variables:\n'
+            '  User         pkg.User\n'
+            '  m            pkg.m',
+        )
+        self.assertIs(type(shell.help), str)
+
     def test_command_setup(self):
         command = self._makeOne()
 
@@ -237,6 +366,23 @@ class TestPShellCommand(unittest.TestCase):
         self.assertTrue(self.bootstrap.closer.called)
         self.assertTrue(shell.help)
 
+    def test_command_setup_help_uses_docstrings(self):
+        command = self._makeOne()
+
+        def helper():  # pragma: no cover
+            """Line one.
+            Line two."""
+
+        def setup(env):
+            env['helper'] = helper
+
+        self.loader.settings = {'pshell': {'setup': setup}}
+        shell = dummy.DummyShell()
+        command.run(shell)
+        self.assertIn(
+            '  helper       Line one.             Line two.', shell.help
+        )
+
     def test_command_setup_generator(self):
         command = self._makeOne()
         did_resume_after_yield = {}
@@ -370,6 +516,7 @@ class TestPShellCommand(unittest.TestCase):
         command.pystartup = os.path.abspath(
             os.path.join(os.path.dirname(__file__), 'pystartup.txt')
         )
+        command.pystartup_cache_dir = self._makeTempDir()
         shell = dummy.DummyShell()
         command.run(shell)
         self.assertEqual(self.bootstrap.a[0], '/foo/bar/myapp.ini#myapp')
@@ -387,6 +534,47 @@ class TestPShellCommand(unittest.TestCase):
         self.assertTrue(self.bootstrap.closer.called)
         self.assertTrue(shell.help)
 
+    def test_command_ignores_missing_pythonstartup(self):
+        command = self._makeOne()
+        command.pystartup = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), 'nonexistent.txt')
+        )
+        shell = dummy.DummyShell()
+        command.run(shell)
+        self.assertEqual(
+            shell.env,
+            {
+                'app': self.bootstrap.app,
+                'root': self.bootstrap.root,
+                'registry': self.bootstrap.registry,
+                'request': self.bootstrap.request,
+                'root_factory': self.bootstrap.root_factory,
+            },
+        )
+        self.assertTrue(self.bootstrap.closer.called)
+
+    def test_command_ignores_pythonstartup_directory(self):
+        command = self._makeOne()
+        command.pystartup = self._makeTempDir()
+        command.pystartup_cache_dir = self._makeTempDir()
+        shell = dummy.DummyShell()
+        command.run(shell)
+        self.assertNotIn('foo', shell.env)
+        self.assertTrue(self.bootstrap.closer.called)
+
+    def test_command_raises_unreadable_pythonstartup(self):
+        from unittest import mock
+
+        command = self._makeOne()
+        command.pystartup = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), 'pystartup.txt')
+        )
+        shell = dummy.DummyShell()
+        target = 'pyramid.scripts.pshell.get_startup_code'
+        with mock.patch(target, side_effect=PermissionError):
+            self.assertRaises(PermissionError, command.run, shell)
+        self.assertTrue(self.bootstrap.closer.called)
+
     def test_list_shells(self):
         command = self._makeOne()
 
@@ -407,6 +595,191 @@ class TestPShellCommand(unittest.TestCase):
             out_calls, ['Available shells:', '  ipython', '  python']
         )
 
+    def test_bootstrap_and_loader_use_pyramid_helpers(self):
+        from unittest import mock
+
+        command = self._makeOne(patch_bootstrap=False, patch_loader=False)
+        with mock.patch('pyramid.paster.bootstrap') as bootstrap:
+            result = command.bootstrap('a.ini', options={'a': '1'})
+        bootstrap.assert_called_once_with(
+            'a.ini', request=None, options={'a': '1'}
+        )
+        self.assertIs(result, bootstrap.return_value)
+
+        target = 'pyramid.scripts.common.get_config_loader'
+        with mock.patch(target) as get_config_loader:
+            result = command.get_config_loader('a.ini')
+        get_config_loader.assert_called_once_with('a.ini')
+        self.assertIs(result, get_config_loader.return_value)
+
+    def test_parser_is_cached(self):
+        cls = self._getTargetClass()
+        parser = cls._get_parser()
+        self.assertIs(cls._get_parser(), parser)
+        self.assertIn('interactive shell', parser.description)
+
+
+class TestLazyObjects(unittest.TestCase):
+    def _makeOne(self, resolver):
+        from pyramid.scripts.pshell import LazyObjects
+
+        return LazyObjects(resolver)
+
+    def test_it(self):
+        from pyramid.util import DottedNameResolver
+
+        obj = object()
+        objects = self._makeOne(DottedNameResolver(None))
+        objects['resolver'] = 'pyramid.util.DottedNameResolver'
+        objects['obj'] = obj
+        self.assertEqual(len(objects), 2)
+        self.assertEqual(list(objects), ['resolver', 'obj'])
+        self.assertIs(objects['resolver'], DottedNameResolver)
+        self.assertIs(objects['obj'], obj)
+        self.assertRaises(KeyError, objects.__getitem__, 'missing')
+
+    def test_contains_does_not_resolve(self):
+        calls = []
+
+        class Resolver:
+            def maybe_resolve(self, v):  # pragma: no cover
+                calls.append(v)
+
+        objects = self._makeOne(Resolver())
+        objects['a'] = 'pkg.mod'
+        self.assertIn('a', objects)
+        self.assertNotIn('b', objects)
+        self.assertEqual(calls, [])
+
+
+class Test_get_startup_cache_dir(unittest.TestCase):
+    def _callFUT(self):
+        from pyramid.scripts.pshell import get_startup_cache_dir
+
+        return get_startup_cache_dir()
+
+    def test_xdg_cache_home(self):
+        from unittest import mock
+
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': '/xdg'}):
+            result = self._callFUT()
+        self.assertEqual(result, os.path.join('/xdg', 'pyramid', 'pshell'))
+
+    def test_default(self):
+        from unittest import mock
+
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': ''}):
+            result = self._callFUT()
+        expected = os.path.join(
+            os.path.expanduser('~'), '.cache', 'pyramid', 'pshell'
+        )
+        self.assertEqual(result, expected)
+
+
+class Test_get_startup_code(unittest.TestCase):
+    def setUp(self):
+        import sys
+        import tempfile
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmpdir, 'cache')
+        self.path = os.path.join(self.tmpdir, '.pythonrc')
+        with open(self.path, 'w') as fp:
+            fp.write('foo = 1\n')
+        self.orig_dont_write_bytecode = sys.dont_write_bytecode
+        sys.dont_write_bytecode = False
+
+    def tearDown(self):
+        import shutil
+        import sys
+
+        sys.dont_write_bytecode = self.orig_dont_write_bytecode
+        shutil.rmtree(self.tmpdir)
+
+    def _callFUT(self, path):
+        from pyramid.scripts.pshell import get_startup_code
+
+        return get_startup_code(path, self.cache_dir)
+
+    def _cached_files(self):
+        return os.listdir(self.cache_dir)
+
+    def _exec(self, code):
+        env = {}
+        exec(code, env)
+        return env
+
+    def test_it_caches_bytecode(self):
+        code = self._callFUT(self.path)
+        self.assertEqual(code.co_filename, self.path)
+        self.assertEqual(self._exec(code)['foo'], 1)
+        self.assertFalse(
+            os.path.exists(os.path.join(self.tmpdir, '__pycache__'))
+        )
+        (cached,) = self._cached_files()
+        self.assertTrue(cached.startswith('startup-'))
+
+        # a cache hit does not compile the source again
+        from unittest import mock
+
+        with mock.patch('builtins.compile') as compile:
+            code = self._callFUT(self.path)
+        self.assertFalse(compile.called)
+        self.assertEqual(self._exec(code)['foo'], 1)
+
+    def test_it_defaults_to_user_cache_dir(self):
+        from unittest import mock
+
+        from pyramid.scripts.pshell import get_startup_code
+
+        xdg = os.path.join(self.tmpdir, 'xdg')
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': xdg}):
+            get_startup_code(self.path)
+        self.assertEqual(
+            len(os.listdir(os.path.join(xdg, 'pyramid', 'pshell'))), 1
+        )
+
+    def test_it_recompiles_changed_file(self):
+        self._callFUT(self.path)
+        with open(self.path, 'w') as fp:
+            fp.write('foo = 22\n')
+        self.assertEqual(self._exec(self._callFUT(self.path))['foo'], 22)
+
+    def test_it_ignores_bad_cache(self):
+        self._callFUT(self.path)
+        (cached,) = self._cached_files()
+        with open(os.path.join(self.cache_dir, cached), 'wb') as fp:
+            fp.write(b'garbage')
+        self.assertEqual(self._exec(self._callFUT(self.path))['foo'], 1)
+
+    def test_it_ignores_unwritable_cache(self):
+        self.cache_dir = self.path  # a file, so makedirs fails
+        self.assertEqual(self._exec(self._callFUT(self.path))['foo'], 1)
+
+    def test_it_removes_partial_cache_file(self):
+        from unittest import mock
+
+        with mock.patch('os.replace', side_effect=OSError):
+            code = self._callFUT(self.path)
+        self.assertEqual(self._exec(code)['foo'], 1)
+        self.assertEqual(self._cached_files(), [])
+
+    def test_it_ignores_missing_partial_cache_file(self):
+        from unittest import mock
+
+        with mock.patch('os.replace', side_effect=OSError):
+            with mock.patch('os.remove', side_effect=OSError) as remove:
+                code = self._callFUT(self.path)
+        self.assertEqual(self._exec(code)['foo'], 1)
+        self.assertTrue(remove.called)
+
+    def test_it_respects_dont_write_bytecode(self):
+        import sys
+
+        sys.dont_write_bytecode = True
+        self.assertEqual(self._exec(self._callFUT(self.path))['foo'], 1)
+        self.assertFalse(os.path.exists(self.cache_dir))
+
 
 class Test_python_shell_runner(unittest.TestCase):
     def _callFUT(self, env, help, interact):
@@ -420,6 +793,35 @@ class Test_python_shell_runner(unittest.TestCase):
         self.assertEqual(interact.local, {'foo': 'bar'})
         self.assertTrue('a help message' in interact.banner)
 
+    def test_banner(self):
+        import sys
+
+        interact = dummy.DummyInteractor()
+        self._callFUT({}, 'a help message', interact)
+        self.assertEqual(
+            interact.banner,
+            f'Python {sys.version} on {sys.platform}\n'
+            'Type "help" for more information.\n\n'
+            'a help message\n',
+        )
+
+
+class Test_iter_entry_points(unittest.TestCase):
+    def _callFUT(self, group):
+        from pyramid.scripts.pshell import iter_entry_points
+
+        return iter_entry_points(group)
+
+    def test_it(self):
+        from pyramid.scripts.pshell import python_shell_runner
+
+        eps = {ep.name: ep for ep in self._callFUT('pyramid.pshell_runner')}
+        self.assertEqual(eps['python'].load(), python_shell_runner)
+
+    def test_missing_group(self):
+        result = self._callFUT('pyramid.tests.no_such_group')
+        self.assertEqual(list(result), [])
+
 
 class Test_main(unittest.TestCase):
     def _callFUT(self, argv):